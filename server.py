@@ -1,91 +1,318 @@
 import asyncio
+import logging
 import websockets
-import json
+import itertools
+import orjson
 import random
-import string
+import secrets
 import os
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+
+# uvloop doesn't support Windows; fall back to the default loop there
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+logger = logging.getLogger(__name__)
 
 # Load board and pawns from shared directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SHARED_DIR = os.path.join(SCRIPT_DIR, "..", "monopoly-online-shared")
 
-with open(os.path.join(SHARED_DIR, "monopoly-wroclaw.json"), "r") as f:
-    BOARD_DATA = json.load(f)
-
-with open(os.path.join(SHARED_DIR, "pawn-set-1.json"), "r") as f:
-    PAWN_DATA = json.load(f)
 
-with open(os.path.join(SHARED_DIR, "cards.json"), "r") as f:
-    CARDS_DATA = json.load(f)
+def _load_json(filename):
+    """Parse a shared JSON file with orjson, interning recurring dict keys
+    so later lookups hit the identity fast path."""
+    def intern_keys(obj):
+        if isinstance(obj, dict):
+            return {sys.intern(k): intern_keys(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [intern_keys(v) for v in obj]
+        return obj
+
+    with open(os.path.join(SHARED_DIR, filename), "rb") as f:
+        return intern_keys(orjson.loads(f.read()))
+
+
+BOARD_DATA = _load_json("monopoly-wroclaw.json")
+PAWN_DATA = _load_json("pawn-set-1.json")
+CARDS_DATA = _load_json("cards.json")
+
+# Card decks as module-level tuples so draws don't re-index CARDS_DATA
+CHANCE_CARDS = tuple(CARDS_DATA["chance"])
+COMMUNITY_CHEST_CARDS = tuple(CARDS_DATA["community-chest"])
+
+# Flat per-tile lookup arrays derived once from the board, so hot handlers
+# index by position instead of chasing nested dict keys per access.
+TILE_ID = [t["id"] for t in BOARD_DATA["board"]]
+TILE_NAME = [t["name"] for t in BOARD_DATA["board"]]
+TILE_COLOR = [t.get("color") for t in BOARD_DATA["board"]]
+TILE_TYPE = [t["type"] for t in BOARD_DATA["board"]]
+TILE_PURCHASABLE = [t.get("properties", {}).get("purchasable", False) for t in BOARD_DATA["board"]]
+TILE_LEVELABLE = [t.get("properties", {}).get("levelable", False) for t in BOARD_DATA["board"]]
+TILE_COSTS = [t.get("owner-costs", []) for t in BOARD_DATA["board"]]
+TILE_RENTS = [t.get("trespass-costs", []) for t in BOARD_DATA["board"]]
+
+# Purchasable tile ids grouped by color, derived once from the static board
+# so monopoly checks don't rescan all 40 tiles per upgrade request.
+COLOR_TO_PROPS = {}
+for _i, _tile in enumerate(BOARD_DATA["board"]):
+    if _tile.get("properties", {}).get("purchasable", False):
+        COLOR_TO_PROPS.setdefault(_tile["color"], []).append(_i)
+
+# The board and pawn set never change after startup, so serialize each once
+# and splice the fragments into NEW_GAME/JOIN_GAME frames instead of
+# re-walking the structures per join.
+BOARD_JSON = orjson.dumps(BOARD_DATA["board"])
+PAWNS_JSON = orjson.dumps(PAWN_DATA["pawns"])
 
 # Game state storage
 lobbies = {}  # lobby_code -> lobby data
-players = {}  # websocket -> player data
+players = {}  # player id -> session data
+connections = {}  # player id -> outbound asyncio.Queue
 STARTING_BALANCE = 1500
+OUTBOUND_QUEUE_SIZE = 256  # frames buffered per client before it's dropped
+
+# Small monotonically increasing ids assigned at accept time; cheaper dict
+# keys than the websocket objects and they don't pin sockets in every map.
+_player_ids = itertools.count(1)
+
+# Bound once so the hot paths skip the module attribute lookup per message
+_dumps = orjson.dumps
+_loads = orjson.loads
+
+
+@dataclass(slots=True)
+class Player:
+    """Per-player state outside the lobby's hot arrays.
+
+    position/balance/has_rolled live in the lobby's parallel arrays; this
+    holds the rest. Slots give fixed-offset attribute access instead of a
+    hashed dict lookup per field.
+    """
+    username: str
+    pawn: str
+    owned: list = field(default_factory=list)   # board positions owned
+    levels: dict = field(default_factory=dict)  # position -> upgrade level
+    username_json: bytes = b""  # orjson-encoded username, spliced into frames
+
+    def __post_init__(self):
+        self.username_json = orjson.dumps(self.username)
 
 
 def generate_lobby_code():
     """Generate a unique 6-character lobby code."""
     while True:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        code = secrets.token_hex(3).upper()
         if code not in lobbies:
             return code
 
 
 def get_available_pawn(lobby_code):
     """Get the next available pawn for a lobby."""
-    used_pawns = [p["pawn"] for p in lobbies[lobby_code]["players"].values()]
-    for pawn in PAWN_DATA["pawns"]:
-        if pawn["name"] not in used_pawns:
-            return pawn["name"]
-    return None
+    free = lobbies[lobby_code]["free_pawns"]
+    return free.popleft() if free else None
+
+
+async def _writer(websocket, queue):
+    """Drain a connection's outbound queue onto its socket.
+
+    One writer task per connection decouples the game handlers from socket
+    drain: handlers just enqueue bytes and a slow client only stalls its
+    own writer. When a burst piles up while the previous frame drains, the
+    queued frames are merged into a single BATCH frame so the socket sees
+    one write instead of N (a batched frame may itself appear as an event;
+    clients unwrap BATCH recursively).
+    """
+    try:
+        while True:
+            payload = await queue.get()
+            if queue.empty():
+                await websocket.send(payload)
+                continue
+            batch = [payload]
+            while not queue.empty() and len(batch) < 32:
+                batch.append(queue.get_nowait())
+            await websocket.send(
+                b'{"type":"BATCH","data":{"events":[' + b",".join(batch) + b"]}}"
+            )
+    except websockets.ConnectionClosed:
+        pass
+
+
+def remove_from_turn_order(lobby, pid):
+    """Swap-pop a player out of player_order and the parallel arrays.
+
+    The last slot moves into the vacated one, so removal is O(1) and only
+    the moved player's index changes. The turn pointer is re-aimed at
+    whoever now occupies the affected slot (wrapping when the tail slot
+    disappears).
+    """
+    idx = lobby["pid_to_idx"].pop(pid, None)
+    if idx is None:
+        return
+    order = lobby["player_order"]
+    last_idx = len(order) - 1
+    if idx != last_idx:
+        last = order[last_idx]
+        order[idx] = last
+        lobby["pid_to_idx"][last] = idx
+        lobby["positions"][idx] = lobby["positions"][last_idx]
+        lobby["balances"][idx] = lobby["balances"][last_idx]
+        lobby["has_rolled"][idx] = lobby["has_rolled"][last_idx]
+    order.pop()
+    lobby["positions"].pop()
+    lobby["balances"].pop()
+    lobby["has_rolled"].pop()
+    cti = lobby["current_turn_index"]
+    if order and (cti == idx or cti == last_idx):
+        lobby["current_turn_index"] = idx % len(order)
+
+
+def send_frame(websocket, payload):
+    """Queue pre-encoded bytes for the connection's writer task.
+
+    The queue is bounded; a client that can't keep up gets disconnected
+    instead of buffering the server into the ground.
+    """
+    queue = connections.get(websocket.player_id)
+    if queue is None:
+        return
+    try:
+        queue.put_nowait(payload)
+        logger.debug("Sent: %s", payload)
+    except asyncio.QueueFull:
+        logger.warning("Outbound queue full for player %d; disconnecting", websocket.player_id)
+        asyncio.ensure_future(websocket.close())
+
 
+# Pre-encoded frames and byte templates for the fixed-shape messages in the
+# turn loop; they bypass the generic encoder entirely.
+GAME_START_FRAME = b'{"type":"GAME_START","data":{}}'
 
-async def send_json(websocket, data):
+
+# Board positions as digits, encoded once for frame splicing
+POSITION_BYTES = tuple(b"%d" % i for i in range(40))
+
+
+def next_turn_frame(username_json):
+    """Build a NEXT_TURN frame from a pre-encoded username."""
+    return b'{"type":"NEXT_TURN","data":{"player":' + username_json + b"}}"
+
+
+def set_position_frame(username_json, position):
+    """Build a SET_POSITION frame from a pre-encoded username."""
+    return (b'{"type":"SET_POSITION","data":{"player":' + username_json
+            + b',"position":' + POSITION_BYTES[position] + b"}}")
+
+
+def transaction_frame(change, sync):
+    """Build a TRANSACTION frame; both fields are plain ints."""
+    return b'{"type":"TRANSACTION","data":{"balance-change":%d,"balance-sync":%d}}' % (change, sync)
+
+
+def error_frame(code, message):
+    """Pre-encode an ERROR frame."""
+    return orjson.dumps({"type": "ERROR", "data": {"code": code, "message": message}})
+
+
+# The fixed set of error responses, encoded once; handlers return these
+# bytes and the dispatcher sends them as-is.
+ERR_USERNAME_REQUIRED = error_frame(400, "Username is required")
+ERR_LOBBY_CODE_REQUIRED = error_frame(400, "Lobby code is required")
+ERR_LOBBY_NOT_FOUND = error_frame(404, "Lobby not found")
+ERR_GAME_ALREADY_STARTED = error_frame(403, "Game already started")
+ERR_USERNAME_TAKEN = error_frame(409, "Username already taken")
+ERR_LOBBY_FULL = error_frame(403, "Lobby is full")
+ERR_NOT_IN_LOBBY = error_frame(403, "Not in a lobby")
+ERR_ONLY_HOST_END = error_frame(403, "Only host can end the game")
+ERR_ONLY_HOST_START = error_frame(403, "Only host can start the game")
+ERR_NEED_TWO_PLAYERS = error_frame(400, "Need at least 2 players to start")
+ERR_GAME_NOT_STARTED = error_frame(400, "Game not started")
+ERR_NOT_YOUR_TURN = error_frame(403, "Not your turn")
+ERR_ALREADY_ROLLED = error_frame(403, "Already rolled this turn")
+ERR_PROPERTY_UNAVAILABLE = error_frame(403, "Property not available")
+ERR_INSUFFICIENT_FUNDS = error_frame(400, "Insufficient funds")
+ERR_PROPERTY_ID_REQUIRED = error_frame(400, "Property ID required")
+ERR_NOT_PROPERTY_OWNER = error_frame(403, "You don't own this property")
+ERR_NOT_UPGRADEABLE = error_frame(400, "This property cannot be upgraded")
+ERR_NOT_A_MONOPOLY = error_frame(403, "You must own all properties of this color to upgrade")
+ERR_MAX_LEVEL = error_frame(400, "Property is already at max level")
+ERR_INVALID_JSON = error_frame(400, "Invalid JSON")
+
+
+def send_json(websocket, data):
     """Helper to send JSON data to a websocket."""
-    await websocket.send(json.dumps(data))
-    print(f"Sent: {json.dumps(data, indent=2)}")
+    # orjson emits bytes; websockets sends them as a binary frame directly.
+    send_frame(websocket, _dumps(data))
 
 
-async def broadcast_to_lobby(lobby_code, data, exclude=None):
-    """Broadcast a message to all players in a lobby."""
-    if lobby_code not in lobbies:
+def broadcast_to_lobby(lobby_code, data, exclude=None):
+    """Broadcast a message to all players in a lobby (exclude by player id)."""
+    lobby = lobbies.get(lobby_code)
+    if lobby is None:
         return
-    for ws in lobbies[lobby_code]["players"]:
-        if ws != exclude:
-            await send_json(ws, data)
+    # websockets.broadcast writes each frame synchronously without waiting
+    # for drain — the cheapest fan-out there is. It deliberately skips
+    # backpressure, which is fine for lobbies of a handful of players.
+    # Pre-encoded frames pass through as-is.
+    payload = data if isinstance(data, bytes) else _dumps(data)
+    sockets = lobby["sockets"]
+    websockets.broadcast(
+        sockets.values() if exclude is None
+        else [ws for pid, ws in sockets.items() if pid != exclude],
+        payload
+    )
 
 
 async def handle_game_create(websocket, data):
     """Handle GAME_CREATE request."""
     username = data.get("username")
     if not username:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Username is required"}}
+        return ERR_USERNAME_REQUIRED
     
+    pid = websocket.player_id
     lobby_code = generate_lobby_code()
     pawn = PAWN_DATA["pawns"][0]["name"]  # First player gets first pawn
     
     lobbies[lobby_code] = {
-        "players": {websocket: {"username": username, "pawn": pawn, "position": 0, "balance": STARTING_BALANCE, "owned-properties": [], "owned-properties-levels": {}, "has_rolled": False}},
-        "host": websocket,
+        "players": {pid: Player(username=username, pawn=pawn)},
+        "sockets": {pid: websocket},
+        "host": pid,
         "started": False,
         "current_turn_index": 0,
-        "player_order": [websocket]
+        "player_order": [pid],
+        # Hot per-turn fields live in parallel arrays sharing player_order's
+        # indexing; pid_to_idx maps a player id to its slot in those arrays.
+        "pid_to_idx": {pid: 0},
+        "positions": [0],
+        "balances": [STARTING_BALANCE],
+        "has_rolled": bytearray(1),
+        # Reverse index: board position -> owning player id
+        "owned_by": {},
+        # Per-lobby RNG; avoids sharing the module-global generator
+        "rng": random.Random(),
+        # Pawns not yet handed out (the creator took the first one)
+        "free_pawns": deque(p["name"] for p in PAWN_DATA["pawns"][1:]),
+        # Names in use (O(1) duplicate check) and the public roster sent
+        # to joiners, both maintained incrementally as players come and go
+        "usernames": {username},
+        "public_players": [{"username": username, "pawn": pawn}]
     }
-    players[websocket] = {"lobby": lobby_code, "username": username}
+    players[pid] = {"lobby": lobby_code, "username": username}
     
-    # Send NEW_GAME response
-    await send_json(websocket, {
-        "type": "NEW_GAME",
-        "data": {
-            "lobby-code": lobby_code,
-            "board": BOARD_DATA["board"],
-            "pawns": PAWN_DATA["pawns"]
-        }
-    })
+    # Send NEW_GAME response (static board/pawns fragments pre-encoded)
+    send_frame(
+        websocket,
+        b'{"type":"NEW_GAME","data":{"lobby-code":' + orjson.dumps(lobby_code)
+        + b',"board":' + BOARD_JSON + b',"pawns":' + PAWNS_JSON + b"}}"
+    )
     
     # Send NEW_PLAYER response
-    await send_json(websocket, {
+    send_json(websocket, {
         "type": "NEW_PLAYER",
         "data": {
             "player": {
@@ -104,53 +331,46 @@ async def handle_request_join(websocket, data):
     lobby_code = data.get("lobby")
     
     if not username:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Username is required"}}
+        return ERR_USERNAME_REQUIRED
     if not lobby_code:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Lobby code is required"}}
+        return ERR_LOBBY_CODE_REQUIRED
     if lobby_code not in lobbies:
-        return {"type": "ERROR", "data": {"code": 404, "message": "Lobby not found"}}
+        return ERR_LOBBY_NOT_FOUND
     if lobbies[lobby_code]["started"]:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Game already started"}}
+        return ERR_GAME_ALREADY_STARTED
     
     # Check if username is already taken in lobby
-    for player_data in lobbies[lobby_code]["players"].values():
-        if player_data["username"] == username:
-            return {"type": "ERROR", "data": {"code": 409, "message": "Username already taken"}}
+    if username in lobbies[lobby_code]["usernames"]:
+        return ERR_USERNAME_TAKEN
     
     pawn = get_available_pawn(lobby_code)
     if not pawn:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Lobby is full"}}
+        return ERR_LOBBY_FULL
     
     # Add player to lobby
-    lobbies[lobby_code]["players"][websocket] = {
-        "username": username,
-        "pawn": pawn,
-        "position": 0,
-        "balance": STARTING_BALANCE,
-        "owned-properties": [],
-        "owned-properties-levels": {},
-        "has_rolled": False
-    }
-    lobbies[lobby_code]["player_order"].append(websocket)
-    players[websocket] = {"lobby": lobby_code, "username": username}
-    
-    # Send JOIN_GAME to the joining player
-    existing_players = [
-        {"username": p["username"], "pawn": p["pawn"]}
-        for p in lobbies[lobby_code]["players"].values()
-    ]
-    
-    await send_json(websocket, {
-        "type": "JOIN_GAME",
-        "data": {
-            "board": BOARD_DATA["board"],
-            "pawns": PAWN_DATA["pawns"],
-            "players": existing_players
-        }
-    })
+    pid = websocket.player_id
+    lobby = lobbies[lobby_code]
+    lobby["players"][pid] = Player(username=username, pawn=pawn)
+    lobby["sockets"][pid] = websocket
+    lobby["pid_to_idx"][pid] = len(lobby["player_order"])
+    lobby["player_order"].append(pid)
+    lobby["positions"].append(0)
+    lobby["balances"].append(STARTING_BALANCE)
+    lobby["has_rolled"].append(0)
+    lobby["usernames"].add(username)
+    lobby["public_players"].append({"username": username, "pawn": pawn})
+    players[pid] = {"lobby": lobby_code, "username": username}
+    
+    # Send JOIN_GAME (static board/pawns fragments pre-encoded; the roster
+    # is kept up to date incrementally rather than rebuilt per join)
+    send_frame(
+        websocket,
+        b'{"type":"JOIN_GAME","data":{"board":' + BOARD_JSON + b',"pawns":' + PAWNS_JSON
+        + b',"players":' + orjson.dumps(lobby["public_players"]) + b"}}"
+    )
     
     # Broadcast NEW_PLAYER to all other players in lobby
-    await broadcast_to_lobby(lobby_code, {
+    broadcast_to_lobby(lobby_code, {
         "type": "NEW_PLAYER",
         "data": {
             "player": {
@@ -158,23 +378,19 @@ async def handle_request_join(websocket, data):
                 "pawn": pawn
             }
         }
-    }, exclude=websocket)
+    }, exclude=pid)
     
     return None
 
 
-async def handle_game_end(websocket, data):
+async def handle_game_end(websocket, lobby_code, lobby, data):
     """Handle GAME_END request."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    
-    if lobbies[lobby_code]["host"] != websocket:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Only host can end the game"}}
+    pid = websocket.player_id
+    if lobby["host"] != pid:
+        return ERR_ONLY_HOST_END
     
     # Broadcast GAME_END to all players
-    await broadcast_to_lobby(lobby_code, {
+    broadcast_to_lobby(lobby_code, {
         "type": "GAME_END",
         "data": {
             "reason": "Host ended the game"
@@ -182,64 +398,55 @@ async def handle_game_end(websocket, data):
     })
     
     # Clean up lobby
-    for ws in list(lobbies[lobby_code]["players"].keys()):
-        if ws in players:
-            del players[ws]
+    for p in list(lobby["players"]):
+        players.pop(p, None)
     del lobbies[lobby_code]
     
     return None
 
 
-async def handle_game_start(websocket, data):
+async def handle_game_start(websocket, lobby_code, lobby, data):
     """Handle GAME_START request."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    
-    if lobbies[lobby_code]["host"] != websocket:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Only host can start the game"}}
-    
-    if len(lobbies[lobby_code]["players"]) < 2:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Need at least 2 players to start"}}
-    
-    lobbies[lobby_code]["started"] = True
-    lobbies[lobby_code]["current_turn_index"] = 0
-    
+    pid = websocket.player_id
+    if lobby["host"] != pid:
+        return ERR_ONLY_HOST_START
+
+    if len(lobby["players"]) < 2:
+        return ERR_NEED_TWO_PLAYERS
+
+    lobby["started"] = True
+    lobby["current_turn_index"] = 0
+
     # Broadcast GAME_START to all players
-    await broadcast_to_lobby(lobby_code, {"type": "GAME_START", "data": {}})
-    
+    broadcast_to_lobby(lobby_code, GAME_START_FRAME)
+
     # Send NEXT_TURN with first player
-    first_player_ws = lobbies[lobby_code]["player_order"][0]
-    first_player = lobbies[lobby_code]["players"][first_player_ws]
-    
-    await broadcast_to_lobby(lobby_code, {
-        "type": "NEXT_TURN",
-        "data": {"player": first_player["username"]}
-    })
-    
-    # Send PLAYER_DATA to each player
-    for ws, player_data in lobbies[lobby_code]["players"].items():
-        # Initialize owned-properties-levels if not exists
-        if "owned-properties-levels" not in player_data:
-            player_data["owned-properties-levels"] = {}
-        
-        # Build detailed properties list
-        detailed_properties = []
-        for prop_id in player_data["owned-properties"]:
-            tile = BOARD_DATA["board"][prop_id]
-            detailed_properties.append({
-                "id": tile["id"],
-                "name": tile["name"],
-                "color": tile["color"],
-                "level": player_data["owned-properties-levels"].get(prop_id, 0)
-            })
-        
-        await send_json(ws, {
+    first_player = lobby["players"][lobby["player_order"][0]]
+
+    broadcast_to_lobby(lobby_code, next_turn_frame(first_player.username_json))
+
+    # Send PLAYER_DATA to each player; send_json only enqueues, so one
+    # slow socket can't hold up the rest of the fan-out.
+    for idx, p in enumerate(lobby["player_order"]):
+        player_data = lobby["players"][p]
+
+        # Build detailed properties list; at game start nobody owns
+        # anything yet, so this is normally just the empty list.
+        detailed_properties = [
+            {
+                "id": TILE_ID[prop_id],
+                "name": TILE_NAME[prop_id],
+                "color": TILE_COLOR[prop_id],
+                "level": player_data.levels[prop_id]
+            }
+            for prop_id in player_data.owned
+        ]
+
+        send_json(lobby["sockets"][p], {
             "type": "PLAYER_DATA",
             "data": {
-                "username": player_data["username"],
-                "balance": player_data["balance"],
+                "username": player_data.username,
+                "balance": lobby["balances"][idx],
                 "owned-properties": detailed_properties
             }
         })
@@ -247,151 +454,129 @@ async def handle_game_start(websocket, data):
     return None
 
 
-async def handle_finish_turn(websocket, data):
+async def handle_finish_turn(websocket, lobby_code, lobby, data):
     """Handle FINISH_TURN request."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    lobby = lobbies[lobby_code]
-    
+    pid = websocket.player_id
     if not lobby["started"]:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Game not started"}}
+        return ERR_GAME_NOT_STARTED
     
-    current_ws = lobby["player_order"][lobby["current_turn_index"]]
-    if current_ws != websocket:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not your turn"}}
+    if lobby["player_order"][lobby["current_turn_index"]] != pid:
+        return ERR_NOT_YOUR_TURN
     
     # Reset has_rolled for current player
-    lobby["players"][websocket]["has_rolled"] = False
+    lobby["has_rolled"][lobby["current_turn_index"]] = 0
     
     # Move to next player
     lobby["current_turn_index"] = (lobby["current_turn_index"] + 1) % len(lobby["player_order"])
-    next_ws = lobby["player_order"][lobby["current_turn_index"]]
-    next_player = lobby["players"][next_ws]
+    next_player = lobby["players"][lobby["player_order"][lobby["current_turn_index"]]]
     
-    await broadcast_to_lobby(lobby_code, {
-        "type": "NEXT_TURN",
-        "data": {"player": next_player["username"]}
-    })
+    broadcast_to_lobby(lobby_code, next_turn_frame(next_player.username_json))
     
     return None
 
 
-async def handle_request_roll(websocket, data):
+async def handle_request_roll(websocket, lobby_code, lobby, data):
     """Handle REQUEST_ROLL request."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    lobby = lobbies[lobby_code]
-    
+    pid = websocket.player_id
     if not lobby["started"]:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Game not started"}}
-    
-    current_ws = lobby["player_order"][lobby["current_turn_index"]]
-    if current_ws != websocket:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not your turn"}}
+        return ERR_GAME_NOT_STARTED
     
-    player = lobby["players"][websocket]
+    if lobby["player_order"][lobby["current_turn_index"]] != pid:
+        return ERR_NOT_YOUR_TURN
     
+    # Alias the lobby structures touched repeatedly below; each lobby[...]
+    # is a hashed dict lookup and this handler is the hottest path.
+    player = lobby["players"][pid]
+    idx = lobby["current_turn_index"]  # roller is always the turn holder
+    balances = lobby["balances"]
+    positions = lobby["positions"]
+    has_rolled = lobby["has_rolled"]
+    rng = lobby["rng"]
+
     # Check if player has already rolled this turn
-    if player["has_rolled"]:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Already rolled this turn"}}
-    
+    if has_rolled[idx]:
+        return ERR_ALREADY_ROLLED
+
     # Mark that player has rolled
-    player["has_rolled"] = True
-    
-    # Roll two dice
-    dice1 = random.randint(1, 6)
-    dice2 = random.randint(1, 6)
+    has_rolled[idx] = 1
+
+    # Roll two dice (randrange skips randint's argument validation; bound
+    # once so the second draw skips the attribute lookup)
+    roll = rng.randrange
+    dice1 = roll(1, 7)
+    dice2 = roll(1, 7)
     total = dice1 + dice2
-    
-    old_position = player["position"]
+
+    old_position = positions[idx]
     new_position = (old_position + total) % 40  # 40 board spaces
-    player["position"] = new_position
-    
+    positions[idx] = new_position
+
+    # Everything addressed to the roller this turn is buffered and sent as
+    # one frame at the end of the handler (BATCH when there are several).
+    events = []
+
     # Check if passed start
     if new_position < old_position:
-        player["balance"] += 200
-        await send_json(websocket, {
+        balances[idx] += 200
+        events.append({
             "type": "TRANSACTION",
             "data": {
                 "balance-change": 200,
-                "balance-sync": player["balance"]
+                "balance-sync": balances[idx]
             }
         })
     
-    # Broadcast SET_POSITION to all
-    await broadcast_to_lobby(lobby_code, {
-        "type": "SET_POSITION",
-        "data": {
-            "player": player["username"],
-            "position": new_position
-        }
-    })
+    # Broadcast SET_POSITION to all (pre-encoded byte template)
+    broadcast_to_lobby(lobby_code, set_position_frame(player.username_json, new_position))
     
     # Check landed tile and handle accordingly
-    tile = BOARD_DATA["board"][new_position]
-    tile_type = tile["type"]
-    
-    if tile["properties"]["purchasable"]:
+    tile_type = TILE_TYPE[new_position]
+
+    if TILE_PURCHASABLE[new_position]:
         # Check if property is already owned
-        property_owned = False
-        owner_ws = None
-        for ws, p_data in lobby["players"].items():
-            if new_position in p_data["owned-properties"]:
-                property_owned = True
-                owner_ws = ws
-                break
-        
-        if not property_owned:
+        owner_pid = lobby["owned_by"].get(new_position)
+
+        if owner_pid is None:
             # Send choice to buy
-            price = tile["owner-costs"][0]
-            await send_json(websocket, {
+            price = TILE_COSTS[new_position][0]
+            events.append({
                 "type": "CHOICE",
                 "data": {
                     "OPTIONS": [
-                        {"label": "BUY", "description": f"Buy {tile['name']} for ${price}"},
+                        {"label": "BUY", "description": f"Buy {TILE_NAME[new_position]} for ${price}"},
                         {"label": "PASS", "description": "Do nothing"}
                     ]
                 }
             })
-        elif owner_ws != websocket:
+        elif owner_pid != pid:
             # Pay rent to owner
-            owner = lobby["players"][owner_ws]
-            
-            # Get property level
-            if "owned-properties-levels" not in owner:
-                owner["owned-properties-levels"] = {}
-            property_level = owner["owned-properties-levels"].get(new_position, 0)
-            
+            owner = lobby["players"][owner_pid]
+            owner_idx = lobby["pid_to_idx"][owner_pid]
+
+            # Get property level (seeded to 0 when the property was bought)
+            property_level = owner.levels[new_position]
+
             # Get rent based on property level
-            rent = tile["trespass-costs"][property_level]
-            
-            player["balance"] -= rent
-            owner["balance"] += rent
-            
-            await send_json(websocket, {
+            rent = TILE_RENTS[new_position][property_level]
+
+            balances[idx] -= rent
+            balances[owner_idx] += rent
+
+            events.append({
                 "type": "TRANSACTION",
                 "data": {
                     "balance-change": -rent,
-                    "balance-sync": player["balance"]
-                }
-            })
-            await send_json(owner_ws, {
-                "type": "TRANSACTION",
-                "data": {
-                    "balance-change": rent,
-                    "balance-sync": owner["balance"]
+                    "balance-sync": balances[idx]
                 }
             })
+            send_frame(lobby["sockets"][owner_pid],
+                       transaction_frame(rent, balances[owner_idx]))
     
     elif tile_type == "chance":
         # Random chance card effect from cards.json
-        card = random.choice(CARDS_DATA["chance"])
+        card = rng.choice(CHANCE_CARDS)
         
-        await send_json(websocket, {
+        events.append({
             "type": "TILE_MESSAGE",
             "data": {
                 "title": "Szansa",
@@ -399,20 +584,20 @@ async def handle_request_roll(websocket, data):
             }
         })
         
-        player["balance"] += card["amount"]
-        await send_json(websocket, {
+        balances[idx] += card["amount"]
+        events.append({
             "type": "TRANSACTION",
             "data": {
                 "balance-change": card["amount"],
-                "balance-sync": player["balance"]
+                "balance-sync": balances[idx]
             }
         })
-    
+
     elif tile_type == "community chest":
         # Random community chest card effect from cards.json
-        card = random.choice(CARDS_DATA["community-chest"])
+        card = rng.choice(COMMUNITY_CHEST_CARDS)
         
-        await send_json(websocket, {
+        events.append({
             "type": "TILE_MESSAGE",
             "data": {
                 "title": "Kasa Społeczna",
@@ -420,155 +605,136 @@ async def handle_request_roll(websocket, data):
             }
         })
         
-        player["balance"] += card["amount"]
-        await send_json(websocket, {
+        balances[idx] += card["amount"]
+        events.append({
             "type": "TRANSACTION",
             "data": {
                 "balance-change": card["amount"],
-                "balance-sync": player["balance"]
+                "balance-sync": balances[idx]
             }
         })
-    
+
     elif tile_type == "penalty":
         # Penalty tile (e.g., Gazeta, Radio Wrocław)
-        penalty = tile["trespass-costs"][0]
-        
-        await send_json(websocket, {
+        penalty = TILE_RENTS[new_position][0]
+
+        events.append({
             "type": "TILE_MESSAGE",
             "data": {
-                "title": tile["name"],
+                "title": TILE_NAME[new_position],
                 "message": f"Zapłać {penalty}$"
             }
         })
         
-        player["balance"] -= penalty
-        await send_json(websocket, {
+        balances[idx] -= penalty
+        events.append({
             "type": "TRANSACTION",
             "data": {
                 "balance-change": -penalty,
-                "balance-sync": player["balance"]
+                "balance-sync": balances[idx]
             }
         })
-    
+
+    # Flush the roller's buffered events in a single frame
+    if len(events) == 1:
+        send_json(websocket, events[0])
+    elif events:
+        send_json(websocket, {"type": "BATCH", "data": {"events": events}})
+
     return None
 
 
-async def handle_choice_response(websocket, data):
+async def handle_choice_response(websocket, lobby_code, lobby, data):
     """Handle CHOICE_RESPONSE from client."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    lobby = lobbies[lobby_code]
-    player = lobby["players"][websocket]
-    
+    pid = websocket.player_id
+    player = lobby["players"][pid]
+    idx = lobby["pid_to_idx"][pid]
+    balances = lobby["balances"]
+
     label = data.get("label")
-    position = player["position"]
-    tile = BOARD_DATA["board"][position]
-    
+    position = lobby["positions"][idx]
+
     if label == "BUY":
-        price = tile["owner-costs"][0]
-        if player["balance"] >= price:
-            player["balance"] -= price
-            player["owned-properties"].append(position)
+        # The owned_by index makes this an O(1) sanity check: the tile must
+        # be purchasable and still on the market.
+        if not TILE_PURCHASABLE[position] or position in lobby["owned_by"]:
+            return ERR_PROPERTY_UNAVAILABLE
+        price = TILE_COSTS[position][0]
+        if balances[idx] >= price:
+            balances[idx] -= price
+            player.owned.append(position)
+            lobby["owned_by"][position] = pid
+            player.levels[position] = 0
             
-            # Initialize owned-properties-levels if not exists
-            if "owned-properties-levels" not in player:
-                player["owned-properties-levels"] = {}
-            player["owned-properties-levels"][position] = 0
+            send_frame(websocket, transaction_frame(-price, balances[idx]))
             
-            await send_json(websocket, {
-                "type": "TRANSACTION",
-                "data": {
-                    "balance-change": -price,
-                    "balance-sync": player["balance"]
-                }
-            })
-            
-            await send_json(websocket, {
+            send_json(websocket, {
                 "type": "PROPERTY_TRANSFER",
                 "data": {
                     "property": {
-                        "id": tile["id"],
-                        "name": tile["name"],
-                        "color": tile["color"],
+                        "id": TILE_ID[position],
+                        "name": TILE_NAME[position],
+                        "color": TILE_COLOR[position],
                         "level": 0
                     }
                 }
             })
         else:
-            return {"type": "ERROR", "data": {"code": 400, "message": "Insufficient funds"}}
+            return ERR_INSUFFICIENT_FUNDS
     
     return None
 
 
-async def handle_request_upgrade(websocket, data):
+async def handle_request_upgrade(websocket, lobby_code, lobby, data):
     """Handle REQUEST_UPGRADE from client."""
-    if websocket not in players:
-        return {"type": "ERROR", "data": {"code": 403, "message": "Not in a lobby"}}
-    
-    lobby_code = players[websocket]["lobby"]
-    lobby = lobbies[lobby_code]
-    player = lobby["players"][websocket]
-    
+    pid = websocket.player_id
+    player = lobby["players"][pid]
+    idx = lobby["pid_to_idx"][pid]
+    balances = lobby["balances"]
+
     property_data = data.get("property", {})
     property_id = property_data.get("id")
     
     if property_id is None:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Property ID required"}}
+        return ERR_PROPERTY_ID_REQUIRED
     
     # Check if player owns this property
-    if property_id not in player["owned-properties"]:
-        return {"type": "ERROR", "data": {"code": 403, "message": "You don't own this property"}}
-    
-    # Get tile data
-    tile = BOARD_DATA["board"][property_id]
+    if property_id not in player.owned:
+        return ERR_NOT_PROPERTY_OWNER
     
     # Check if property is upgradeable
-    if not tile.get("properties", {}).get("levelable", False):
-        return {"type": "ERROR", "data": {"code": 400, "message": "This property cannot be upgraded"}}
-    
+    if not TILE_LEVELABLE[property_id]:
+        return ERR_NOT_UPGRADEABLE
+
     # Check if player owns all properties of this color (monopoly)
-    property_color = tile["color"]
-    all_properties_of_color = [t for t in BOARD_DATA["board"] if t.get("color") == property_color and t.get("properties", {}).get("purchasable", False)]
-    owned_properties_of_color = [prop_id for prop_id in player["owned-properties"] if BOARD_DATA["board"][prop_id].get("color") == property_color]
-    
-    if len(owned_properties_of_color) < len(all_properties_of_color):
-        return {"type": "ERROR", "data": {"code": 403, "message": "You must own all properties of this color to upgrade"}}
-    
-    # Get current level (stored in player's owned-properties-levels dict)
-    if "owned-properties-levels" not in player:
-        player["owned-properties-levels"] = {}
+    owned_set = set(player.owned)
+    if not all(p in owned_set for p in COLOR_TO_PROPS.get(TILE_COLOR[property_id], ())):
+        return ERR_NOT_A_MONOPOLY
     
-    current_level = player["owned-properties-levels"].get(property_id, 0)
+    # Get current level (seeded to 0 when the property was bought)
+    current_level = player.levels[property_id]
     
     # Check if already at max level
     if current_level >= 5:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Property is already at max level"}}
+        return ERR_MAX_LEVEL
     
     # Get upgrade cost (next level's cost)
     next_level = current_level + 1
-    upgrade_cost = tile["owner-costs"][next_level]
+    upgrade_cost = TILE_COSTS[property_id][next_level]
     
     # Check if player has enough money
-    if player["balance"] < upgrade_cost:
-        return {"type": "ERROR", "data": {"code": 400, "message": "Insufficient funds"}}
-    
+    if balances[idx] < upgrade_cost:
+        return ERR_INSUFFICIENT_FUNDS
+
     # Perform upgrade
-    player["balance"] -= upgrade_cost
-    player["owned-properties-levels"][property_id] = next_level
-    
+    balances[idx] -= upgrade_cost
+    player.levels[property_id] = next_level
+
     # Send TRANSACTION for cost
-    await send_json(websocket, {
-        "type": "TRANSACTION",
-        "data": {
-            "balance-change": -upgrade_cost,
-            "balance-sync": player["balance"]
-        }
-    })
+    send_frame(websocket, transaction_frame(-upgrade_cost, balances[idx]))
     
     # Send PROPERTY_UPGRADE confirmation
-    await send_json(websocket, {
+    send_json(websocket, {
         "type": "PROPERTY_UPGRADE",
         "data": {
             "property": {
@@ -581,62 +747,101 @@ async def handle_request_upgrade(websocket, data):
     return None
 
 
+# Dispatch tables: one dict lookup per message instead of a scan down an
+# if/elif chain. Pre-lobby handlers take raw (websocket, data); lobby
+# handlers additionally get (lobby_code, lobby) resolved by the
+# dispatcher, so past dispatch they can assume membership.
+OPEN_MESSAGE_TYPES = {
+    "GAME_CREATE": handle_game_create,
+    "REQUEST_JOIN": handle_request_join,
+}
+
+LOBBY_MESSAGE_TYPES = {
+    "GAME_START": handle_game_start,
+    "FINISH_TURN": handle_finish_turn,
+    "REQUEST_ROLL": handle_request_roll,
+    "CHOICE_RESPONSE": handle_choice_response,
+    "REQUEST_UPGRADE": handle_request_upgrade,
+    "GAME_END": handle_game_end,
+}
+
+
 async def handle_message(websocket):
     """Main message handler for WebSocket connections."""
+    pid = next(_player_ids)
+    websocket.player_id = pid
+    queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+    connections[pid] = queue
+    writer_task = asyncio.create_task(_writer(websocket, queue))
     try:
         async for message in websocket:
             try:
-                data = json.loads(message)
-                print(f"Received: {json.dumps(data, indent=2)}")
+                data = _loads(message)
+                logger.debug("Received: %s", data)
                 
                 msg_type = data.get("type")
                 msg_data = data.get("data", {})
                 
-                error = None
-                
-                if msg_type == "GAME_CREATE":
-                    error = await handle_game_create(websocket, msg_data)
-                elif msg_type == "REQUEST_JOIN":
-                    error = await handle_request_join(websocket, msg_data)
-                elif msg_type == "GAME_START":
-                    error = await handle_game_start(websocket, msg_data)
-                elif msg_type == "FINISH_TURN":
-                    error = await handle_finish_turn(websocket, msg_data)
-                elif msg_type == "REQUEST_ROLL":
-                    error = await handle_request_roll(websocket, msg_data)
-                elif msg_type == "CHOICE_RESPONSE":
-                    error = await handle_choice_response(websocket, msg_data)
-                elif msg_type == "REQUEST_UPGRADE":
-                    error = await handle_request_upgrade(websocket, msg_data)
-                elif msg_type == "GAME_END":
-                    error = await handle_game_end(websocket, msg_data)
+                handler = LOBBY_MESSAGE_TYPES.get(msg_type)
+                if handler is not None:
+                    session = players.get(pid)
+                    if session is None:
+                        error = ERR_NOT_IN_LOBBY
+                    else:
+                        lobby_code = session["lobby"]
+                        error = await handler(websocket, lobby_code,
+                                              lobbies[lobby_code], msg_data)
+                elif msg_type in OPEN_MESSAGE_TYPES:
+                    error = await OPEN_MESSAGE_TYPES[msg_type](websocket, msg_data)
                 else:
-                    error = {"type": "ERROR", "data": {"code": 400, "message": f"Unknown message type: {msg_type}"}}
+                    error = error_frame(400, f"Unknown message type: {msg_type}")
                 
                 if error:
-                    await send_json(websocket, error)
+                    send_frame(websocket, error)
                     
-            except json.JSONDecodeError:
-                print(f"Invalid JSON received: {message}")
-                await send_json(websocket, {"type": "ERROR", "data": {"code": 400, "message": "Invalid JSON"}})
+            except orjson.JSONDecodeError:
+                logger.warning("Invalid JSON received: %s", message)
+                send_frame(websocket, ERR_INVALID_JSON)
     finally:
         # Clean up on disconnect
-        if websocket in players:
-            lobby_code = players[websocket]["lobby"]
-            if lobby_code in lobbies:
-                if websocket in lobbies[lobby_code]["players"]:
-                    del lobbies[lobby_code]["players"][websocket]
-                if websocket in lobbies[lobby_code]["player_order"]:
-                    lobbies[lobby_code]["player_order"].remove(websocket)
-                if not lobbies[lobby_code]["players"]:
-                    del lobbies[lobby_code]
-            del players[websocket]
+        writer_task.cancel()
+        del connections[pid]
+        session = players.pop(pid, None)
+        if session is not None:
+            lobby = lobbies.get(session["lobby"])
+            if lobby is not None:
+                left = lobby["players"].pop(pid, None)
+                lobby["sockets"].pop(pid, None)
+                if left is not None:
+                    # Release the leaving player's properties, pawn and name
+                    for prop_id in left.owned:
+                        lobby["owned_by"].pop(prop_id, None)
+                    lobby["free_pawns"].appendleft(left.pawn)
+                    lobby["usernames"].discard(left.username)
+                    lobby["public_players"] = [
+                        p for p in lobby["public_players"]
+                        if p["username"] != left.username
+                    ]
+                remove_from_turn_order(lobby, pid)
+                if not lobby["players"]:
+                    del lobbies[session["lobby"]]
 
 
 async def main():
-    async with websockets.serve(handle_message, "localhost", 8080):
-        print("WebSocket server running on ws://localhost:8080")
+    # compression=None turns off permessage-deflate: our frames are tiny
+    # JSON objects where deflate costs CPU and ~64 KiB per connection for
+    # negligible wire savings. Client messages are far below 64 KiB and
+    # outbound frames are bytes already, so the tight max_size/max_queue
+    # limits just cap what a misbehaving client can make us buffer.
+    async with websockets.serve(
+        handle_message, "localhost", 8080,
+        compression=None, max_size=2**16, max_queue=64
+    ):
+        logger.info("WebSocket server running on ws://localhost:8080")
         await asyncio.Future()  # Run forever
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
\ No newline at end of file